@@ -0,0 +1,466 @@
+'''
+Benchmark suite for the hot paths of every module.
+Each case builds seeded synthetic input at a given scale, then calls one public entry point once per item.
+We report throughput, latency percentiles and peak traced memory, and write the results as JSON so runs can be compared.
+
+Usage:
+   python Benchmark.py                           # every case at the small scale
+   python Benchmark.py --scale medium large --output bench.json
+   python Benchmark.py --case Compress.compress
+'''
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from Compress import Compress, CompressedUrlColumns, CompressedUrlWriter
+from HttpHeaderParser import HttpHeaderParser
+from MutualRank import MutualRank, CsrMutualRank, UserRegistry, generate_wishlists, np
+from ServerPenalty import ServerPenalty
+from StripeCapital import StripeCapital
+from UserPoints import UserPoints
+
+# multiplier applied to the base item counts of every case
+SCALES = {
+    "small": 1,
+    "medium": 10,
+    "large": 100,
+}
+
+
+# ---------- synthetic data ----------
+
+def generate_server_log(rng, hours):
+    return ' '.join(rng.choice('01') for _ in range(hours))
+
+
+def generate_aggregate_log(rng, servers, hours):
+    parts = []
+    for _ in range(servers):
+        if rng.random() < 0.2:
+            # unfinished server, only its last BEGIN before a real one counts
+            parts.append("BEGIN " + generate_server_log(rng, rng.randint(1, hours)))
+        parts.append("BEGIN " + generate_server_log(rng, rng.randint(1, hours)) + " END")
+    return '\n'.join(parts)
+
+
+def generate_ledger(rng, merchants, lines):
+    loans = []
+    result = []
+    for _ in range(lines):
+        if not loans or rng.random() < 0.1:
+            merchant_id = "acct_" + str(rng.randrange(merchants))
+            loan_id = "loan" + str(len(loans))
+            loans.append((merchant_id, loan_id))
+            result.append(f"CREATE_LOAN: {merchant_id},{loan_id},{rng.randint(1000, 1000000)}")
+            continue
+        
+        merchant_id, loan_id = rng.choice(loans)
+        action = rng.random()
+        if action < 0.2:
+            result.append(f"PAY_LOAN: {merchant_id},{loan_id},{rng.randint(1, 5000)}")
+        elif action < 0.3:
+            result.append(f"INCREASE_LOAN: {merchant_id},{loan_id},{rng.randint(1, 5000)}")
+        else:
+            result.append(f"TRANSACTION_PROCESSED: {merchant_id},{loan_id},{rng.randint(1, 10000)},{rng.randint(1, 100)}")
+    return result
+
+
+def generate_transactions(rng, payers, n):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    result = []
+    for _ in range(n):
+        timestamp = start + timedelta(minutes=rng.randrange(525600))
+        result.append(("PAYER" + str(rng.randrange(payers)), rng.randint(1, 1000),
+                       timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")))
+    return result
+
+
+def generate_languages(rng, n):
+    languages = set()
+    while len(languages) < n:
+        languages.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(2)) + '-' +
+                      ''.join(rng.choice(string.ascii_uppercase) for _ in range(2)))
+    return sorted(languages)
+
+
+def generate_header(rng, languages, n):
+    tags = []
+    for _ in range(n):
+        lang = rng.choice(languages)
+        tags.append(lang.split('-')[0] if rng.random() < 0.3 else lang)
+    if rng.random() < 0.5:
+        tags.append('*')
+    return ', '.join(tags)
+
+
+def generate_url(rng, majors, minors):
+    parts = []
+    for _ in range(rng.randint(1, majors)):
+        parts.append('.'.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12)))
+                              for _ in range(rng.randint(1, minors))))
+    return '/'.join(parts)
+
+
+def generate_wishlist_lists(rng, n, k):
+    # pure Python, so the MutualRank cases run without numpy; every user ranks k distinct other users
+    k = min(k, n - 1)
+    return [[y + (y >= x) for y in rng.sample(range(n - 1), k)] for x in range(n)]
+
+
+def generate_wishlist_lines(rng, n, k):
+    # "user: target target ..." lines with string ids, as read by UserRegistry.load_wishlists
+    rank = generate_wishlist_lists(rng, n, k)
+    return [f"user{x}: " + ' '.join("user" + str(y) for y in wishlist) for x, wishlist in enumerate(rank)]
+
+
+# ---------- cases ----------
+# each case is (name, setup) where setup(rng, scale) returns (call, items) and call(item) is measured
+
+def penalty_compute(rng, scale):
+    penalty = ServerPenalty()
+    items = []
+    for _ in range(200 * scale):
+        log = generate_server_log(rng, 100)
+        items.append((log, rng.randint(0, 100)))
+    return lambda item: penalty.compute_penalty(*item), items
+
+
+def penalty_best_time(rng, scale):
+    penalty = ServerPenalty()
+    items = [generate_server_log(rng, 50) for _ in range(20 * scale)]
+    return penalty.find_best_removal_time, items
+
+
+def penalty_aggregate(rng, scale):
+    penalty = ServerPenalty()
+    items = [generate_aggregate_log(rng, 20, 30) for _ in range(5 * scale)]
+    return penalty.get_best_removal_times, items
+
+
+def capital_add_line(rng, scale):
+    capital = StripeCapital()
+    items = generate_ledger(rng, 50 * scale, 2000 * scale)
+    return capital.add_line, items
+
+
+def points_add(rng, scale):
+    points = UserPoints()
+    items = generate_transactions(rng, 10, 200 * scale)
+    return lambda item: points.add(*item), items
+
+
+def points_spend(rng, scale):
+    points = UserPoints()
+    for payer, point, timestamp in generate_transactions(rng, 10, 200 * scale):
+        points.add(payer, point, timestamp)
+    items = [rng.randint(1, 100) for _ in range(200 * scale)]
+    return points.spend, items
+
+
+def points_balance(rng, scale):
+    points = UserPoints()
+    for payer, point, timestamp in generate_transactions(rng, 10, 200 * scale):
+        points.add(payer, point, timestamp)
+    return lambda item: points.get_balance(), list(range(50))
+
+
+def header_case(method):
+    def setup(rng, scale):
+        parser = HttpHeaderParser()
+        languages = generate_languages(rng, 50)
+        call = getattr(parser, method)
+        items = []
+        for _ in range(500 * scale):
+            supported = rng.sample(languages, 20)
+            items.append((generate_header(rng, languages, 8), supported))
+        return lambda item: call(*item), items
+    return setup
+
+
+def compress_case(m):
+    def setup(rng, scale):
+        comp = Compress()
+        items = [generate_url(rng, 5, 6) for _ in range(1000 * scale)]
+        return lambda item: comp.compress(item, m), items
+    return setup
+
+
+def compress_batch(rng, scale):
+    comp = Compress()
+    items = [[generate_url(rng, 5, 6) for _ in range(1000)] for _ in range(scale)]
+    return lambda item: comp.compress_batch(item, 3), items
+
+
+def compress_writer(rng, scale):
+    writer = CompressedUrlWriter()
+    hosts = [generate_url(rng, 1, 3) for _ in range(20)]
+    items = [rng.choice(hosts) + '/' + generate_url(rng, 4, 3) for _ in range(1000 * scale)]
+    return writer.add, items
+
+
+def temp_path(suffix):
+    # a temp file removed when the suite exits
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    atexit.register(os.remove, path)
+    return path
+
+
+def build_columns(rng, scale):
+    writer = CompressedUrlWriter()
+    hosts = [generate_url(rng, 1, 3) for _ in range(20)]
+    writer.add_all(rng.choice(hosts) + '/' + generate_url(rng, 4, 3) for _ in range(1000 * scale))
+    return writer.build()
+
+
+def columns_getitem(rng, scale):
+    columns = build_columns(rng, scale)
+    items = [rng.randrange(len(columns)) for _ in range(2000 * scale)]
+    return columns.__getitem__, items
+
+
+def columns_group_case(method):
+    def setup(rng, scale):
+        columns = build_columns(rng, scale)
+        call = getattr(columns, method)
+        return call, [rng.randint(0, 3) for _ in range(20)]
+    return setup
+
+
+def columns_save(rng, scale):
+    columns = build_columns(rng, scale)
+    path = temp_path(".bin")
+    return lambda item: columns.save(path), list(range(10))
+
+
+def columns_load(rng, scale):
+    path = temp_path(".bin")
+    build_columns(rng, scale).save(path)
+    return CompressedUrlColumns.load, [path] * 10
+
+
+def mutual_rank_case(method):
+    def setup(rng, scale):
+        n = 1000 * scale
+        rank = MutualRank(generate_wishlist_lists(rng, n, 10))
+        call = getattr(rank, method)
+        items = []
+        for _ in range(2000 * scale):
+            x = rng.randrange(n)
+            if len(rank.rank[x]) > 1:
+                items.append((x, rng.randint(1, len(rank.rank[x]) - 1)))
+        return lambda item: call(*item), items
+    return setup
+
+
+def mutual_rank_pair_case(method):
+    # (x, y) queries, half of them about a user x actually ranks
+    def setup(rng, scale):
+        n = 1000 * scale
+        rank = MutualRank(generate_wishlist_lists(rng, n, 10))
+        call = getattr(rank, method)
+        items = []
+        for _ in range(2000 * scale):
+            x = rng.randrange(n)
+            y = rng.choice(rank.rank[x]) if rng.random() < 0.5 else rng.randrange(n)
+            items.append((x, y))
+        return lambda item: call(*item), items
+    return setup
+
+
+def mutual_rank_user_case(method):
+    def setup(rng, scale):
+        n = 1000 * scale
+        rank = MutualRank(generate_wishlist_lists(rng, n, 10))
+        return getattr(rank, method), [rng.randrange(n) for _ in range(2000 * scale)]
+    return setup
+
+
+def mutual_rank_bump_batch(rng, scale):
+    # each item is a batch of 100 bumps
+    n = 1000 * scale
+    rank = MutualRank(generate_wishlist_lists(rng, n, 10))
+    items = []
+    for _ in range(20 * scale):
+        batch = []
+        for _ in range(100):
+            x = rng.randrange(n)
+            batch.append((x, rng.randint(1, len(rank.rank[x]) - 1)))
+        items.append(batch)
+    return rank.bump_batch, items
+
+
+def registry_add(rng, scale):
+    registry = UserRegistry()
+    items = ["user" + str(rng.randrange(10 ** 9)) for _ in range(10000 * scale)]
+    return registry.add, items
+
+
+def registry_lookup(rng, scale):
+    ids = ["user" + str(i) for i in range(10000 * scale)]
+    registry = UserRegistry(ids)
+    # half hits, half misses
+    items = [rng.choice(ids) if rng.random() < 0.5 else "missing" + str(rng.randrange(10 ** 9))
+             for _ in range(10000 * scale)]
+    return registry.lookup, items
+
+
+def registry_load_wishlists(rng, scale):
+    # each item is a chunk of lines loaded into a fresh registry
+    lines = generate_wishlist_lines(rng, 1000 * scale, 10)
+    items = [lines[i:i + 1000] for i in range(0, len(lines), 1000)]
+    return lambda item: UserRegistry().load_wishlists(item), items
+
+
+def mutual_rank_from_file(rng, scale):
+    path = temp_path(".txt")
+    with open(path, 'w') as f:
+        f.write('\n'.join(generate_wishlist_lines(rng, 1000 * scale, 10)))
+    return MutualRank.from_file, [path] * 3
+
+
+def mutual_rank_all_pairs(rng, scale):
+    offsets, targets = generate_wishlists(10000 * scale, 10, rng.randrange(2 ** 32))
+    csr = CsrMutualRank(offsets, targets)
+    return lambda item: csr.all_mutual_pairs(), list(range(5))
+
+
+CASES = [
+    ("ServerPenalty.compute_penalty", penalty_compute),
+    ("ServerPenalty.find_best_removal_time", penalty_best_time),
+    ("ServerPenalty.get_best_removal_times", penalty_aggregate),
+    ("StripeCapital.add_line", capital_add_line),
+    ("UserPoints.add", points_add),
+    ("UserPoints.spend", points_spend),
+    ("UserPoints.get_balance", points_balance),
+    ("HttpHeaderParser.parse_accept_language", header_case("parse_accept_language")),
+    ("HttpHeaderParser.parse_accept_language2", header_case("parse_accept_language2")),
+    ("HttpHeaderParser.parse_accept_language3", header_case("parse_accept_language3")),
+    ("Compress.compress", compress_case(None)),
+    ("Compress.compress_m3", compress_case(3)),
+    ("CompressedUrlWriter.add", compress_writer),
+    ("CompressedUrlColumns.__getitem__", columns_getitem),
+    ("CompressedUrlColumns.group_by_major", columns_group_case("group_by_major")),
+    ("CompressedUrlColumns.count_by_major", columns_group_case("count_by_major")),
+    ("CompressedUrlColumns.save", columns_save),
+    ("CompressedUrlColumns.load", columns_load),
+    ("MutualRank.has_mutual_first_choice", mutual_rank_user_case("has_mutual_first_choice")),
+    ("MutualRank.has_mutual_pair_for_rank", mutual_rank_case("has_mutual_pair_for_rank")),
+    ("MutualRank.rank_of", mutual_rank_pair_case("rank_of")),
+    ("MutualRank.mutual_rank", mutual_rank_pair_case("mutual_rank")),
+    ("MutualRank.is_mutually_ranked", mutual_rank_pair_case("is_mutually_ranked")),
+    ("MutualRank.mutual_partners", mutual_rank_user_case("mutual_partners")),
+    ("MutualRank.changed_pairings", mutual_rank_case("changed_pairings")),
+    ("MutualRank.bump", mutual_rank_case("bump")),
+    ("MutualRank.bump_batch", mutual_rank_bump_batch),
+    ("UserRegistry.add", registry_add),
+    ("UserRegistry.lookup", registry_lookup),
+    ("UserRegistry.load_wishlists", registry_load_wishlists),
+    ("MutualRank.from_file", mutual_rank_from_file),
+]
+# numpy backed paths are only measured when numpy is installed
+if np is not None:
+    CASES += [
+        ("Compress.compress_batch", compress_batch),
+        ("CsrMutualRank.all_mutual_pairs", mutual_rank_all_pairs),
+    ]
+
+
+# ---------- measurement ----------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def measure(name, setup, scale_name, seed=0):
+    scale = SCALES[scale_name]
+    
+    # timing pass, without tracemalloc overhead
+    call, items = setup(random.Random(seed), scale)
+    latencies = []
+    total_start = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        call(item)
+        latencies.append(time.perf_counter() - start)
+    total = time.perf_counter() - total_start
+    
+    # memory pass on fresh state, so mutating entry points see the same input again
+    call, items = setup(random.Random(seed), scale)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for item in items:
+        call(item)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    
+    latencies.sort()
+    return {
+        "case": name,
+        "scale": scale_name,
+        "seed": seed,
+        "items": len(items),
+        "total_seconds": total,
+        "throughput_per_second": len(items) / total if total > 0 else 0.0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_suite(scales=("small",), cases=None, seed=0):
+    results = []
+    for scale_name in scales:
+        for name, setup in CASES:
+            if cases and name not in cases:
+                continue
+            results.append(measure(name, setup, scale_name, seed))
+    
+    return {
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__ if np is not None else None,
+        "results": results,
+    }
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark every module's public entry points.")
+    parser.add_argument("--scale", nargs="+", choices=sorted(SCALES), default=["small"])
+    parser.add_argument("--case", nargs="+", choices=[name for name, _ in CASES])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write, stdout when omitted")
+    args = parser.parse_args()
+    
+    report = run_suite(args.scale, args.case, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        for result in report["results"]:
+            print(f"{result['case']} [{result['scale']}]: {result['throughput_per_second']:.0f}/s, "
+                  f"p99 {result['latency_seconds']['p99'] * 1e6:.1f}us, {result['peak_memory_bytes']} bytes")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    run()
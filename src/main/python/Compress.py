@@ -29,9 +29,21 @@ Task:
 Therefore, to further compress the String, we want to only keep m (m > 0) compressed minor parts from Part1 within each major part.
 If a major part has more than m minor parts, we keep the first (m-1) minor parts as is, but concatenate the first letter of the m-th minor part and the last letter of the last minor part with the count
 '''
+import struct
+import sys
+from array import array
+from collections import defaultdict
+
+from Instrumentation import instrumented
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class Compress:
+    @instrumented("Compress.compress", items=lambda arguments, result: len(arguments["s"]))
     def compress(self, s, m=None):
         if m is None:
             return self._compress_part1(s)
@@ -94,6 +106,241 @@ class Compress:
     def _compress_minor(self, s):
         length = len(s)
         return s[0] + str(length - 2) + s[-1]
+    
+    def compress_batch(self, urls, m=None):
+        # same output as [compress(s, m) for s in urls], computed with numpy array operations
+        if np is None:
+            raise ImportError("compress_batch requires numpy")
+        if len(urls) == 0:
+            return []
+        
+        buf = np.frombuffer(('\n'.join(urls) + '\n').encode('ascii'), dtype=np.uint8)
+        
+        # every minor part ends right before a '.', '/' or '\n'
+        is_sep = (buf == ord('.')) | (buf == ord('/')) | (buf == ord('\n'))
+        end = np.flatnonzero(is_sep)
+        start = np.empty_like(end)
+        start[0] = 0
+        start[1:] = end[:-1] + 1
+        
+        # inputs compress rejects must not turn into misaligned rows
+        if np.count_nonzero(buf == ord('\n')) != len(urls):
+            raise ValueError("URLs must not contain newlines")
+        if np.any(start == end):
+            raise ValueError("URLs must not contain empty minor parts")
+        
+        if m is not None:
+            # index of each minor part within its major part
+            major_last = np.flatnonzero(buf[end] != ord('.'))
+            major_first = np.empty_like(major_last)
+            major_first[0] = 0
+            major_first[1:] = major_last[:-1] + 1
+            major_id = np.repeat(np.arange(len(major_last)), major_last - major_first + 1)
+            j = np.arange(len(end)) - major_first[major_id]
+            
+            # the m-th minor part absorbs the rest of its major part, the ones after it are dropped
+            end = np.where(j == m - 1, end[major_last[major_id]], end)
+            keep = j <= m - 1
+            start = start[keep]
+            end = end[keep]
+        
+        first = buf[start]
+        last = buf[end - 1]
+        sep = buf[end]
+        value = (end - start - 2).astype(np.int64)
+        
+        neg = value < 0
+        digits = np.abs(value)
+        num_digits = np.ones_like(digits)
+        rest = digits // 10
+        while rest.any():
+            num_digits += rest > 0
+            rest //= 10
+        num_len = num_digits + neg
+        
+        # each token is first char, number, last char and its trailing separator
+        token_len = num_len + 3
+        offset = np.zeros(len(token_len), dtype=np.int64)
+        np.cumsum(token_len[:-1], out=offset[1:])
+        
+        out = np.empty(int(offset[-1] + token_len[-1]), dtype=np.uint8)
+        out[offset] = first
+        out[offset[neg] + 1] = ord('-')
+        place = digits
+        for p in range(int(num_digits.max())):
+            mask = p < num_digits
+            pos = offset + neg + num_digits - p
+            out[pos[mask]] = ord('0') + (place[mask] % 10)
+            place = place // 10
+        out[offset + num_len + 1] = last
+        out[offset + num_len + 2] = sep
+        
+        return out.tobytes().decode('ascii').split('\n')[:-1]
+
+
+class CompressedUrlWriter:
+    '''
+    Columnar output for compressed URLs.
+    Every compressed major and minor part is dictionary encoded, so repeated segments
+    (hosts, common path parts) are stored once and referenced by an integer code.
+    Rows are laid out as offsets into flat code columns:
+       url_offsets[i]..url_offsets[i+1]       -> majors of url i in major_codes
+       major_offsets[k]..major_offsets[k+1]   -> minors of major k in minor_codes
+    '''
+    def __init__(self, m=None):
+        self.m = m
+        self.comp = Compress()
+        self.major_dict = []
+        self.major_index = {}
+        self.minor_dict = []
+        self.minor_index = {}
+        self.major_codes = array('i')
+        self.minor_codes = array('i')
+        self.url_offsets = array('i', [0])
+        self.major_offsets = array('i', [0])
+    
+    def add(self, s):
+        compressed = self.comp.compress(s, self.m)
+        for major in compressed.split('/'):
+            self.major_codes.append(self._encode(major, self.major_dict, self.major_index))
+            for minor in major.split('.'):
+                self.minor_codes.append(self._encode(minor, self.minor_dict, self.minor_index))
+            self.major_offsets.append(len(self.minor_codes))
+        self.url_offsets.append(len(self.major_codes))
+    
+    def add_all(self, urls):
+        for s in urls:
+            self.add(s)
+    
+    def build(self):
+        # the columns get their own copies, so later add() calls do not change them
+        return CompressedUrlColumns(list(self.major_dict), list(self.minor_dict),
+                                    array('i', self.major_codes), array('i', self.minor_codes),
+                                    array('i', self.url_offsets), array('i', self.major_offsets))
+    
+    def _encode(self, segment, dictionary, index):
+        code = index.get(segment)
+        if code is None:
+            code = len(dictionary)
+            index[segment] = code
+            dictionary.append(segment)
+        return code
+
+
+class CompressedUrlColumns:
+    '''
+    Read side of CompressedUrlWriter.
+    Strings are only rebuilt when a row is accessed; grouping works on the integer codes.
+    save/load store the columns as little-endian int32 arrays followed by the two dictionaries.
+    '''
+    MAGIC = b'CURLCOL1'
+    
+    def __init__(self, major_dict, minor_dict, major_codes, minor_codes, url_offsets, major_offsets):
+        self.major_dict = major_dict
+        self.minor_dict = minor_dict
+        self.major_codes = major_codes
+        self.minor_codes = minor_codes
+        self.url_offsets = url_offsets
+        self.major_offsets = major_offsets
+    
+    def __len__(self):
+        return len(self.url_offsets) - 1
+    
+    def __getitem__(self, i):
+        i = self._row(i)
+        majors = []
+        for k in range(self.url_offsets[i], self.url_offsets[i + 1]):
+            minors = self.minor_codes[self.major_offsets[k]:self.major_offsets[k + 1]]
+            majors.append('.'.join(self.minor_dict[code] for code in minors))
+        return '/'.join(majors)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def major_code(self, i, position):
+        # code of the major part at `position` of row i, -1 if the row is shorter
+        i = self._row(i)
+        start = self.url_offsets[i]
+        if 0 <= position < self.url_offsets[i + 1] - start:
+            return self.major_codes[start + position]
+        return -1
+    
+    def minor_codes_at(self, i, position):
+        i = self._row(i)
+        start = self.url_offsets[i]
+        if 0 <= position < self.url_offsets[i + 1] - start:
+            k = start + position
+            return self.minor_codes[self.major_offsets[k]:self.major_offsets[k + 1]]
+        return array('i')
+    
+    def group_by_major(self, position):
+        # { major code: [row indices] }, position 0 groups by host
+        groups = defaultdict(list)
+        for i in range(len(self)):
+            code = self.major_code(i, position)
+            if code >= 0:
+                groups[code].append(i)
+        return groups
+    
+    def count_by_major(self, position):
+        counts = defaultdict(int)
+        for i in range(len(self)):
+            code = self.major_code(i, position)
+            if code >= 0:
+                counts[code] += 1
+        return counts
+    
+    def decode_major(self, code):
+        return self.major_dict[code]
+    
+    def decode_minor(self, code):
+        return self.minor_dict[code]
+    
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            for column in (self.major_codes, self.minor_codes, self.url_offsets, self.major_offsets):
+                if sys.byteorder == 'big':
+                    column = array('i', column)
+                    column.byteswap()
+                f.write(struct.pack('<q', len(column)))
+                f.write(column.tobytes())
+            for dictionary in (self.major_dict, self.minor_dict):
+                # compressed segments never contain a newline
+                blob = '\n'.join(dictionary).encode('utf-8')
+                f.write(struct.pack('<qq', len(dictionary), len(blob)))
+                f.write(blob)
+    
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("Not a compressed URL column file: " + path)
+            
+            columns = []
+            for _ in range(4):
+                count, = struct.unpack('<q', f.read(8))
+                column = array('i')
+                column.frombytes(f.read(4 * count))
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                columns.append(column)
+            
+            dictionaries = []
+            for _ in range(2):
+                count, size = struct.unpack('<qq', f.read(16))
+                blob = f.read(size).decode('utf-8')
+                dictionaries.append(blob.split('\n') if count > 0 else [])
+        
+        return cls(dictionaries[0], dictionaries[1], *columns)
+    
+    def _row(self, i):
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("Row out of range: " + str(i))
+        return i
 
 
 def run():
@@ -102,6 +349,18 @@ def run():
     print(comp.compress("stripe.com/payments/checkout/customer.maria", 1))
     print(comp.compress("section/how.to.write.a.java.program.in.one.day"))
     print(comp.compress("section/how.to.write.a.java.program.in.one.day", 3))
+    
+    print(comp.compress_batch(["stripe.com/payments/checkout/customer.maria",
+                               "section/how.to.write.a.java.program.in.one.day"], 3))
+    
+    writer = CompressedUrlWriter()
+    writer.add_all(["stripe.com/payments/checkout/customer.maria",
+                    "stripe.com/payments/refunds",
+                    "section/how.to.write.a.java.program.in.one.day"])
+    columns = writer.build()
+    print(list(columns))
+    for code, rows in columns.group_by_major(0).items():
+        print(columns.decode_major(code), rows)
 
 
 if __name__ == "__main__":
@@ -52,6 +52,7 @@ Examples:
   parse_accept_language("fr-FR, fr, *", ["en-US", "fr-CA", "fr-FR"])
   returns: ["fr-FR", "fr-CA", "en-US"]
 '''
+from Instrumentation import instrumented
 
 
 class HttpHeaderParser:
@@ -85,6 +86,7 @@ class HttpHeaderParser:
         
         return result
     
+    @instrumented("HttpHeaderParser.parse_accept_language3", items=lambda arguments, result: len(result))
     def parse_accept_language3(self, header, supported):
         result = []
         lang_map = self._build_map(supported)
@@ -0,0 +1,214 @@
+'''
+Opt-in instrumentation for hot paths.
+Set STRIPE_INSTRUMENT=1 before importing a module to record, per operation:
+   - a call counter and an error counter
+   - a latency histogram
+   - an items-processed gauge (last call) and counter (total)
+   - a counter of failures inside the items callback, which never reach the caller
+Optional settings:
+   STRIPE_INSTRUMENT_FILE      where export() writes the Prometheus text snapshot, default "metrics.prom"
+   STRIPE_INSTRUMENT_PROFILE   profile one in every N calls with cProfile and tracemalloc, default 0 (off)
+When STRIPE_INSTRUMENT is not set, @instrumented returns the function untouched, so there is no overhead at all.
+A snapshot is written at exit while instrumentation is enabled.
+
+Example:
+   @instrumented("Compress.compress", items=lambda arguments, result: len(arguments["s"]))
+   def compress(self, s, m=None):
+      ...
+'''
+import atexit
+import cProfile
+import functools
+import inspect
+import os
+import pstats
+import time
+import tracemalloc
+
+ENABLED = os.environ.get("STRIPE_INSTRUMENT", "").lower() in ("1", "true", "yes", "on")
+OUTPUT_FILE = os.environ.get("STRIPE_INSTRUMENT_FILE", "metrics.prom")
+PROFILE_EVERY = int(os.environ.get("STRIPE_INSTRUMENT_PROFILE", "0") or 0)
+
+# upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.latency_sum = 0.0
+        self.items_last = 0
+        self.items_total = 0
+        self.items_errors = 0
+        self.profiled = 0
+        self.peak_memory = 0
+    
+    def observe(self, seconds):
+        self.calls += 1
+        self.latency_sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self):
+        # { operation name: OperationStats }
+        self.operations = {}
+        self.profiler = None
+        self.profiling = False
+    
+    def stats(self, name):
+        if name not in self.operations:
+            self.operations[name] = OperationStats()
+        return self.operations[name]
+    
+    def reset(self):
+        self.operations = {}
+        self.profiler = None
+    
+    def profile_call(self, stats, func, args, kwargs):
+        # nested instrumented calls are timed but not profiled twice
+        if self.profiling:
+            return func(*args, **kwargs)
+        
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # another profiler is already active, e.g. python -m cProfile, so this call is not sampled
+            return func(*args, **kwargs)
+        
+        # when tracing is already on, its peak belongs to the caller, so it is read but never reset
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        
+        self.profiling = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+            self.profiling = False
+            stats.profiled += 1
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                stats.peak_memory = max(stats.peak_memory, peak - baseline)
+                tracemalloc.stop()
+            else:
+                # the outer peak may predate this call, so only growth during it is known
+                stats.peak_memory = max(stats.peak_memory, current - baseline)
+    
+    def snapshot(self):
+        lines = []
+        
+        def metric(name, kind, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for op, value in values:
+                lines.append(f'{name}{{op="{op}"}} {value}')
+        
+        ops = sorted(self.operations.items())
+        metric("stripe_calls_total", "counter", "Number of calls per operation.",
+               [(op, s.calls) for op, s in ops])
+        metric("stripe_errors_total", "counter", "Number of calls that raised.",
+               [(op, s.errors) for op, s in ops])
+        metric("stripe_items_processed", "gauge", "Items processed by the last call.",
+               [(op, s.items_last) for op, s in ops])
+        metric("stripe_items_total", "counter", "Items processed by all calls.",
+               [(op, s.items_total) for op, s in ops])
+        metric("stripe_items_errors_total", "counter", "Calls whose items callback raised.",
+               [(op, s.items_errors) for op, s in ops])
+        
+        lines.append("# HELP stripe_latency_seconds Call latency per operation.")
+        lines.append("# TYPE stripe_latency_seconds histogram")
+        for op, s in ops:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, s.bucket_counts):
+                cumulative += count
+                lines.append(f'stripe_latency_seconds_bucket{{op="{op}",le="{bound}"}} {cumulative}')
+            lines.append(f'stripe_latency_seconds_bucket{{op="{op}",le="+Inf"}} {s.calls}')
+            lines.append(f'stripe_latency_seconds_sum{{op="{op}"}} {s.latency_sum}')
+            lines.append(f'stripe_latency_seconds_count{{op="{op}"}} {s.calls}')
+        
+        if PROFILE_EVERY > 0:
+            metric("stripe_profiled_calls_total", "counter", "Calls sampled by the profiler.",
+                   [(op, s.profiled) for op, s in ops])
+            metric("stripe_peak_memory_bytes", "gauge", "Largest traced peak of a sampled call, net growth when tracing was already on.",
+                   [(op, s.peak_memory) for op, s in ops])
+        
+        return '\n'.join(lines) + '\n'
+    
+    def export(self, path=None):
+        # writes the Prometheus text snapshot, and the cProfile stats next to it when sampling ran
+        path = path or OUTPUT_FILE
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.snapshot())
+        os.replace(tmp, path)
+        
+        if self.profiler is not None:
+            pstats.Stats(self.profiler).dump_stats(path + ".prof")
+        return path
+
+
+registry = Registry()
+
+
+def instrumented(name, items=None):
+    '''
+    Decorator recording calls, latency and items processed for `name`.
+    items(arguments, result) returns how many items a call processed, 1 per call when omitted.
+    arguments maps parameter names to the values of the call, however they were passed.
+    '''
+    def decorate(func):
+        if not ENABLED:
+            return func
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = registry.stats(name)
+            sample = PROFILE_EVERY > 0 and stats.calls % PROFILE_EVERY == 0
+            start = time.perf_counter()
+            try:
+                if sample:
+                    result = registry.profile_call(stats, func, args, kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except Exception:
+                stats.errors += 1
+                stats.observe(time.perf_counter() - start)
+                raise
+            stats.observe(time.perf_counter() - start)
+            
+            count = 1
+            if items is not None:
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    count = items(bound.arguments, result)
+                except Exception:
+                    # metrics must never break the instrumented call
+                    stats.items_errors += 1
+                    return result
+            stats.items_last = count
+            stats.items_total += count
+            return result
+        
+        return wrapper
+    
+    return decorate
+
+
+def export(path=None):
+    return registry.export(path)
+
+
+if ENABLED:
+    atexit.register(export)
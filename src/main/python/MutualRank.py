@@ -50,46 +50,433 @@ changed_pairings('b', 2) // returns ['c']
 // if b's second choice becomes their first choice, no mutually-ranked pairings are affected
 changed_pairings('b', 1) // returns []
 '''
+import sys
+import time
+import tracemalloc
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def resolve_user(registry, x, strict=False):
+    # turns an external id into its index; unknown ids give -1, or raise when strict
+    if isinstance(x, str):
+        if registry is None:
+            raise ValueError("No registry to look up user: " + x)
+        i = registry.lookup(x)
+        if i < 0 and strict:
+            raise ValueError("Unknown user: " + x)
+        return i
+    return x
+
+
+class UserRegistry:
+    '''
+    Compact mapping between external user ids and dense int32 indices.
+    Ids are stored back to back as utf-8 in one bytearray, ids[i] = data[offsets[i]:offsets[i + 1]].
+    Lookups go through an open addressing hash table of int32 indices, -1 marks an empty slot.
+    No per-user Python objects are kept: memory is the id bytes plus 8 bytes of offset and 8 to 16 bytes
+    of hash table per user, since the table doubles once half full (about 18 B/user measured at 50k ids).
+    '''
+    MAX_USERS = 2 ** 31 - 1
+    
+    def __init__(self, ids=()):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+        self.table = array('i', [-1]) * 8
+        for user_id in ids:
+            self.add(user_id)
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __contains__(self, user_id):
+        return self.lookup(user_id) >= 0
+    
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets) + self.table.itemsize * len(self.table)
+    
+    def add(self, user_id):
+        key = user_id.encode('utf-8')
+        slot, i = self._find(key)
+        if i >= 0:
+            return i
+        
+        i = len(self)
+        if i >= self.MAX_USERS:
+            raise ValueError("Too many users for int32 indices")
+        self.table[slot] = i
+        self.data += key
+        self.offsets.append(len(self.data))
+        # keep the table at most half full so probe sequences stay short
+        if 2 * (i + 1) > len(self.table):
+            self._grow()
+        return i
+    
+    def lookup(self, user_id):
+        return self._find(user_id.encode('utf-8'))[1]
+    
+    def name(self, i):
+        if i < 0 or i >= len(self):
+            raise IndexError("Unknown user index: " + str(i))
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+    
+    def load_wishlists(self, lines):
+        # each line is "user: target target ...", returns int32 wishlists indexed by registry index
+        rank = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            params = line.split(':', 1)
+            if len(params) < 2:
+                raise ValueError("Invalid wishlist line: " + line)
+            
+            x = self.add(params[0].strip())
+            wishlist = array('i', [self.add(y) for y in params[1].split()])
+            while len(rank) < len(self):
+                rank.append(array('i'))
+            rank[x] = wishlist
+        
+        while len(rank) < len(self):
+            rank.append(array('i'))
+        return rank
+    
+    def _find(self, key):
+        # returns (slot, index), index is -1 and slot is free when key is not registered
+        mask = len(self.table) - 1
+        slot = hash(key) & mask
+        while True:
+            i = self.table[slot]
+            if i < 0:
+                return slot, -1
+            start = self.offsets[i]
+            end = self.offsets[i + 1]
+            if end - start == len(key) and self.data[start:end] == key:
+                return slot, i
+            slot = (slot + 1) & mask
+    
+    def _grow(self):
+        table = array('i', [-1]) * (2 * len(self.table))
+        mask = len(table) - 1
+        for i in range(len(self)):
+            slot = hash(bytes(self.data[self.offsets[i]:self.offsets[i + 1]])) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = i
+        self.table = table
+
+
+class PairingChange:
+    def __init__(self, kind, x, y, r):
+        # kind is "gained" or "lost", r is the mutual rank gained or lost
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.rank = r
+    
+    def __eq__(self, other):
+        return isinstance(other, PairingChange) and \
+            (self.kind, self.x, self.y, self.rank) == (other.kind, other.x, other.y, other.rank)
+    
+    def __repr__(self):
+        return f"{self.kind}({self.x}, {self.y}, {self.rank})"
 
 
 class MutualRank:
-    def __init__(self, rank):
+    def __init__(self, rank, registry=None):
+        # users can be passed as indices, or as ids when a registry is given
         self.rank = rank
+        self.registry = registry
+        self.listeners = []
+        # position[x][y] = index of y in x's wishlist
+        self.position = [{y: r for r, y in enumerate(wishlist)} for wishlist in rank]
+        # mutual[x] = { y: r } for every y that x and y both rank at r
+        self.mutual = [{} for _ in rank]
+        for x, wishlist in enumerate(rank):
+            for r, y in enumerate(wishlist):
+                if self.position[y].get(x) == r:
+                    self.mutual[x][y] = r
+    
+    @classmethod
+    def from_file(cls, path):
+        registry = UserRegistry()
+        with open(path) as f:
+            rank = registry.load_wishlists(f)
+        return cls(rank, registry)
     
     def has_mutual_first_choice(self, x):
-        if x < 0 or x >= len(self.rank):
-            return False
-        
-        y = self.rank[x][0]
-        return self.rank[y][0] == x
+        return self.has_mutual_pair_for_rank(x, 0)
     
     def has_mutual_pair_for_rank(self, x, r):
+        x = self._resolve(x)
         if x < 0 or x >= len(self.rank):
             return False
         
         if 0 <= r < len(self.rank[x]):
             y = self.rank[x][r]
-            if r < len(self.rank[y]):
-                return self.rank[y][r] == x
+            return self.position[y].get(x) == r
         
         return False
     
+    def rank_of(self, x, y):
+        # rank x gives y, -1 if y is not on x's wishlist
+        x = self._resolve(x)
+        y = self._resolve(y)
+        if x < 0 or x >= len(self.rank):
+            return -1
+        return self.position[x].get(y, -1)
+    
+    def mutual_rank(self, x, y):
+        # rank x and y give each other, -1 if they are not mutually ranked
+        x = self._resolve(x)
+        y = self._resolve(y)
+        if x < 0 or x >= len(self.rank):
+            return -1
+        return self.mutual[x].get(y, -1)
+    
+    def is_mutually_ranked(self, x, y):
+        return self.mutual_rank(x, y) >= 0
+    
+    def mutual_partners(self, x):
+        named = isinstance(x, str)
+        x = self._resolve(x)
+        if x < 0 or x >= len(self.rank):
+            return []
+        return self._names(list(self.mutual[x]), named)
+    
     def changed_pairings(self, x, r):
         result = []
+        named = isinstance(x, str)
+        x = self._resolve(x)
+        if x < 0 or x >= len(self.rank):
+            return result
         
         if 0 <= r < len(self.rank[x]):
             y = self.rank[x][r]
-            if r < len(self.rank[y]) and self.rank[y][r] == x:
-                result.append(y)
-            if 0 <= r - 1 < len(self.rank[y]) and self.rank[y][r - 1] == x:
+            # None when y does not rank x, which never matches a rank
+            ry = self.position[y].get(x)
+            if ry == r or ry == r - 1:
                 result.append(y)
         
         if 0 <= r - 1 < len(self.rank[x]):
             y = self.rank[x][r - 1]
-            if r < len(self.rank[y]) and self.rank[y][r] == x:
+            ry = self.position[y].get(x)
+            if ry == r or ry == r - 1:
                 result.append(y)
         
-        return result
+        return self._names(result, named)
+    
+    def subscribe(self, listener):
+        # listener is called with the list of PairingChange produced by every bump
+        self.listeners.append(listener)
+    
+    def bump(self, x, r):
+        # move x's entry at rank r up to r - 1 and return the pairings that changed
+        named = isinstance(x, str)
+        x = self._resolve(x, strict=True)
+        self._check_bump(x, r)
+        before = {}
+        self._swap(x, r, before)
+        return self._emit(x, before, named)
+    
+    def bump_batch(self, bumps):
+        # apply every (x, r) bump in order, only net changes are reported
+        # all bumps are checked first, so an invalid one leaves the network untouched
+        named = False
+        resolved = []
+        for x, r in bumps:
+            named = named or isinstance(x, str)
+            x = self._resolve(x, strict=True)
+            self._check_bump(x, r)
+            resolved.append((x, r))
+        
+        before = {}
+        for x, r in resolved:
+            self._swap(x, r, before)
+        return self._emit(None, before, named)
+    
+    def _resolve(self, x, strict=False):
+        return resolve_user(self.registry, x, strict)
+    
+    def _names(self, users, named):
+        if named:
+            return [self.registry.name(y) for y in users]
+        return users
+    
+    def _emit(self, x, before, named=False):
+        changes = []
+        for (a, b), old in before.items():
+            new = self.mutual[a].get(b, -1)
+            if old == new:
+                continue
+            if x is not None and a != x:
+                a, b = b, a
+            if named:
+                a, b = self._names([a, b], named)
+            if old >= 0:
+                changes.append(PairingChange("lost", a, b, old))
+            if new >= 0:
+                changes.append(PairingChange("gained", a, b, new))
+        
+        if changes:
+            for listener in self.listeners:
+                listener(changes)
+        return changes
+    
+    def _check_bump(self, x, r):
+        # swaps never change wishlist lengths, so a bump valid now stays valid later in a batch
+        if x < 0 or x >= len(self.rank):
+            raise ValueError("Unknown user: " + str(x))
+        if r <= 0 or r >= len(self.rank[x]):
+            raise ValueError("Invalid rank to bump for user " + str(x) + ": " + str(r))
+    
+    def _swap(self, x, r, before):
+        # move x's entry at rank r up to r - 1, keeping position and mutual in sync
+        # before records the mutual rank of every touched pair the first time it is seen
+        wishlist = self.rank[x]
+        up = wishlist[r]
+        down = wishlist[r - 1]
+        for y in (up, down):
+            pair = (x, y) if x < y else (y, x)
+            if pair not in before:
+                before[pair] = self.mutual[x].get(y, -1)
+        
+        wishlist[r - 1] = up
+        wishlist[r] = down
+        self.position[x][up] = r - 1
+        self.position[x][down] = r
+        
+        for y in (up, down):
+            self.mutual[x].pop(y, None)
+            self.mutual[y].pop(x, None)
+            ry = self.position[y].get(x)
+            if ry == self.position[x][y]:
+                self.mutual[x][y] = ry
+                self.mutual[y][x] = ry
+
+
+class CsrMutualRank:
+    '''
+    Array-backed wishlists for whole-network queries.
+    Wishlist of user x is targets[offsets[x]:offsets[x + 1]], both arrays are int32.
+    '''
+    def __init__(self, offsets, targets, registry=None):
+        if np is None:
+            raise ImportError("CsrMutualRank requires numpy")
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.registry = registry
+    
+    @classmethod
+    def from_lists(cls, rank, registry=None):
+        if np is None:
+            raise ImportError("CsrMutualRank requires numpy")
+        lengths = np.fromiter((len(wishlist) for wishlist in rank), dtype=np.int32, count=len(rank))
+        offsets = np.zeros(len(rank) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=offsets[1:])
+        targets = np.fromiter((y for wishlist in rank for y in wishlist), dtype=np.int32, count=int(offsets[-1]))
+        return cls(offsets, targets, registry)
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def nbytes(self):
+        return self.offsets.nbytes + self.targets.nbytes
+    
+    def wishlist(self, x):
+        x = resolve_user(self.registry, x)
+        if x < 0 or x >= len(self):
+            return self.targets[:0]
+        return self.targets[self.offsets[x]:self.offsets[x + 1]]
+    
+    def has_mutual_pair_for_rank(self, x, r):
+        x = resolve_user(self.registry, x)
+        if x < 0 or x >= len(self):
+            return False
+        
+        start = self.offsets[x]
+        if 0 <= r < self.offsets[x + 1] - start:
+            y = self.targets[start + r]
+            if r < self.offsets[y + 1] - self.offsets[y]:
+                return bool(self.targets[self.offsets[y] + r] == x)
+        
+        return False
+    
+    def all_mutual_pairs(self):
+        # returns (x, y, r) arrays with x < y for every pair that rank each other at r
+        lengths = np.diff(self.offsets)
+        owner = np.repeat(np.arange(len(self), dtype=np.int32), lengths)
+        r = np.arange(len(self.targets), dtype=np.int32) - self.offsets[owner]
+        
+        y = self.targets
+        valid = r < lengths[y]
+        back = np.where(valid, self.offsets[y] + r, 0)
+        mutual = valid & (self.targets[back] == owner) & (owner < y)
+        
+        return owner[mutual], y[mutual], r[mutual]
+
+
+def generate_wishlists(n, k, seed=0):
+    # seeded synthetic network where every user ranks up to k distinct other users, as CSR arrays
+    if np is None:
+        raise ImportError("generate_wishlists requires numpy")
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros(max(n, 0) + 1, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    
+    rng = np.random.default_rng(seed)
+    targets = rng.integers(0, n - 1, size=(n, k), dtype=np.int32)
+    targets += targets >= np.arange(n, dtype=np.int32)[:, None]
+    
+    keep = np.ones_like(targets, dtype=bool)
+    for j in range(1, k):
+        keep[:, j] = (targets[:, :j] != targets[:, j:j + 1]).all(axis=1)
+    
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(keep.sum(axis=1), out=offsets[1:])
+    return offsets, targets[keep]
+
+
+def benchmark(n=100000, k=10, seed=0):
+    offsets, targets = generate_wishlists(n, k, seed)
+    
+    # list_bytes is the raw list-of-lists layout, the same data CSR holds;
+    # mutual_rank_bytes adds the position and mutual indexes MutualRank builds on top of it
+    tracemalloc.start()
+    rank = [targets[offsets[x]:offsets[x + 1]].tolist() for x in range(n)]
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    lists = MutualRank(rank)
+    mutual_rank_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    list_pairs = 0
+    for x in range(n):
+        for r in range(len(rank[x])):
+            if rank[x][r] > x and lists.has_mutual_pair_for_rank(x, r):
+                list_pairs += 1
+    list_seconds = time.perf_counter() - start
+    
+    csr = CsrMutualRank(offsets, targets)
+    start = time.perf_counter()
+    xs, _, _ = csr.all_mutual_pairs()
+    csr_seconds = time.perf_counter() - start
+    
+    return {
+        "users": n,
+        "entries": len(targets),
+        "list_pairs": list_pairs,
+        "csr_pairs": len(xs),
+        "list_bytes": list_bytes,
+        "mutual_rank_bytes": mutual_rank_bytes,
+        "csr_bytes": csr.nbytes(),
+        "list_seconds": list_seconds,
+        "csr_seconds": csr_seconds,
+    }
 
 
 def run():
@@ -103,7 +490,31 @@ def run():
     print(rank.changed_pairings(3, 1))
     print(rank.changed_pairings(1, 2))
     print(rank.changed_pairings(1, 1))
+    
+    print(rank.rank_of(1, 2))
+    print(rank.mutual_rank(0, 3))
+    print(rank.mutual_partners(0))
+    
+    rank.subscribe(print)
+    rank.bump(3, 1)
+    rank.bump_batch([(1, 2), (1, 1), (1, 1)])
+    
+    csr = CsrMutualRank.from_lists([[2, 3], [3, 0, 2], [0, 1], [2, 0, 1]])
+    print(csr.has_mutual_pair_for_rank(0, 1))
+    print([tuple(int(v) for v in pair) for pair in zip(*csr.all_mutual_pairs())])
+    
+    registry = UserRegistry()
+    named = MutualRank(registry.load_wishlists(["a: c d", "b: d a c", "c: a b", "d: c a b"]), registry)
+    print(named.has_mutual_first_choice('a'))
+    print(named.has_mutual_pair_for_rank('a', 1))
+    print(named.changed_pairings('d', 1))
+    print(named.changed_pairings('b', 2))
+    print(named.bump('d', 1))
 
 
 if __name__ == "__main__":
-    run()
+    # timings vary between runs, so the benchmark only runs when asked for
+    if "--benchmark" in sys.argv:
+        print(benchmark())
+    else:
+        run()
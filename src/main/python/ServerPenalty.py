@@ -74,6 +74,7 @@ Again, you should use tests to demonstrate that your solution is correct.
 Example
   get_best_removal_times("BEGIN BEGIN \nBEGIN 1 1 BEGIN 0 0\n END 1 1 BEGIN") should return an array: [2]
 '''
+from Instrumentation import instrumented
 
 
 class ServerPenalty:
@@ -103,6 +104,7 @@ class ServerPenalty:
         
         return min_idx
     
+    @instrumented("ServerPenalty.get_best_removal_times", items=lambda arguments, result: len(result))
     def get_best_removal_times(self, file_content):
         result = []
         sb = []
@@ -89,11 +89,14 @@ Explanation:
 from collections import defaultdict
 import math
 
+from Instrumentation import instrumented
+
 class StripeCapital:
     def __init__(self):
         # { merchant_id: {loan_id: amount} }
         self.merchants = defaultdict(dict)
     
+    @instrumented("StripeCapital.add_line")
     def add_line(self, line):
         params = line.split(': ', 1)
         if len(params) < 2:
@@ -187,24 +190,29 @@ class StripeCapital:
                 print(f"{merchant}: {debt}")
         print("-----")
 
-        
-strip = StripeCapital()
-strip.add_line(" CREATE_LOAN: acct_foobar,loan,5000")
-strip.add_line("PAY_LOAN: acct_foobar,loan,1000")
-strip.display()
 
-strip = StripeCapital()
-strip.add_line("CREATE_LOAN: acct_foobar,loan1,5000")
-strip.add_line("CREATE_LOAN: acct_foobar,loan2,5000")
-strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan1,500,10")
-strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan2,500,1")
-strip.display()
+def run():
+    strip = StripeCapital()
+    strip.add_line(" CREATE_LOAN: acct_foobar,loan,5000")
+    strip.add_line("PAY_LOAN: acct_foobar,loan,1000")
+    strip.display()
+    
+    strip = StripeCapital()
+    strip.add_line("CREATE_LOAN: acct_foobar,loan1,5000")
+    strip.add_line("CREATE_LOAN: acct_foobar,loan2,5000")
+    strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan1,500,10")
+    strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan2,500,1")
+    strip.display()
+    
+    strip = StripeCapital()
+    strip.add_line("CREATE_LOAN: acct_foobar,loan1,1000")
+    strip.add_line("CREATE_LOAN: acct_foobar,loan2,2000")
+    strip.add_line("CREATE_LOAN: acct_barfoo,loan1,3000")
+    strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan1,100,1")
+    strip.add_line("PAY_LOAN: acct_barfoo,loan1,1000")
+    strip.add_line("INCREASE_LOAN: acct_foobar,loan2,1000")
+    strip.display()
+
 
-strip = StripeCapital()
-strip.add_line("CREATE_LOAN: acct_foobar,loan1,1000")
-strip.add_line("CREATE_LOAN: acct_foobar,loan2,2000")
-strip.add_line("CREATE_LOAN: acct_barfoo,loan1,3000")
-strip.add_line("TRANSACTION_PROCESSED: acct_foobar,loan1,100,1")
-strip.add_line("PAY_LOAN: acct_barfoo,loan1,1000")
-strip.add_line("INCREASE_LOAN: acct_foobar,loan2,1000")
-strip.display()
\ No newline at end of file
+if __name__ == "__main__":
+    run()
@@ -48,6 +48,8 @@ FAQ: For any requirements not specified via an example, use your best judgement
 
 from datetime import datetime
 
+from Instrumentation import instrumented
+
 
 class Transaction:
     def __init__(self, timestamp, payer, point):
@@ -64,6 +66,7 @@ class UserPoints:
         self.transactions.append(Transaction(timestamp, payer, point))
         self.transactions.sort(key=lambda t: t.timestamp)
     
+    @instrumented("UserPoints.spend", items=lambda arguments, result: len(result))
     def spend(self, point):
         deductions = {}
         